@@ -1,25 +1,31 @@
 import os
+import errno
 import socket
-import netifaces
+import psutil
 from flask import (
-    Flask, request, render_template, send_from_directory, jsonify, 
-    redirect, url_for, Response, stream_with_context, flash, session, 
+    Flask, request, render_template, send_file, send_from_directory, jsonify, 
+    redirect, url_for, Response, flash, session, 
     current_app, g
 )
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from zeroconf import ServiceInfo, Zeroconf
+from waitress import serve
 import threading
+import queue
 import time
 from datetime import datetime
 import io
 import logging
-import uuid
 import config
+import serialization
 import shutil
+import tempfile
 import argparse
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps, lru_cache
-from typing import Dict, List, Any, Optional, Callable, Tuple, Union, Set, Generator
+from typing import Dict, List, Any, Optional, Callable, Tuple, Union, Set
 
 # Initialize configuration instance early
 config_instance = config.Configuration.get_instance()
@@ -59,19 +65,52 @@ CORS(app)
 
 # Configure app based on loaded settings
 app.config['MAX_CONTENT_LENGTH'] = config_instance.get_max_file_size()
-app.config['SECRET_KEY'] = str(uuid.uuid4())  # For flash messages
+app.config['SECRET_KEY'] = config_instance.get_or_create_secret_key()  # For flash messages
 
 # Global variables
-CHUNK_SIZE = 8192  # 8KB chunks for file streaming
-SMALL_FILE_THRESHOLD = 50 * 1024 * 1024  # 50MB threshold for direct vs. streaming download
+CHUNK_SIZE = 1024 * 1024  # 1MB chunks for file streaming
+
+# Allowance for multipart boundaries and headers on top of the max file size
+_MULTIPART_OVERHEAD = 1024 * 1024
+
+# Directory in the first store where upload bodies are spooled before the copy
+_UPLOAD_TEMP_DIR = '.upload-tmp'
+
+# Thread pool for upload disk writes - also bounds concurrent writers
+_io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='upload-io')
 
 # Cache for network interfaces - refreshed periodically
 _network_interfaces_cache = None
 _network_cache_timestamp = 0
 _NETWORK_CACHE_TTL = 60  # seconds
+_NETWORK_REFRESH_INTERVAL = 30  # seconds between background refreshes
+
+# Hostname doesn't change while the application runs
+_HOSTNAME = socket.gethostname()
+
+# Zeroconf service properties - built once from the loaded configuration
+_SERVICE_NAME = config_instance.get_config().get("service_name", "WiFi File Transfer")
+_SERVICE_PROPERTIES = {
+    b'name': _SERVICE_NAME.encode('utf-8'),
+    b'path': b'/files'
+}
+
+# Cache for store information - invalidated when files change
+_store_info_cache = None
+_store_info_cache_timestamp = 0
+_STORE_INFO_CACHE_TTL = 60  # seconds
+
+# Cache for responses of read-only routes - invalidated when files change
+# Entries are (expiry time, body, status, content type) keyed by path
+_response_cache: Dict[str, Tuple[float, bytes, int, str]] = {}
+_RESPONSE_CACHE_TTL = 5  # seconds
+_RESPONSE_CACHE_MAX_ENTRIES = 32
 
-# Cache for mime types
-_mime_types = {
+# Serialized /api/files payload and the file list it was built from
+_files_api_cache: Optional[Tuple[List[config.FileRecord], bytes]] = None
+
+# Read-only map of file extensions to mime types
+_mime_types = MappingProxyType({
     'pdf': 'application/pdf',
     'jpg': 'image/jpeg',
     'jpeg': 'image/jpeg',
@@ -95,26 +134,31 @@ _mime_types = {
     'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     'ppt': 'application/vnd.ms-powerpoint',
     'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-    'mkv': 'video/x-matroska'
-}
+    'mkv': 'video/x-matroska',
+    'exe': 'application/vnd.microsoft.portable-executable'
+})
+
+_DEFAULT_MIME_TYPE = 'application/octet-stream'
+
+# Reverse map of mime types to file extensions
+_EXT_BY_MIME = MappingProxyType({mime: ext for ext, mime in _mime_types.items()})
 
 # Helper Functions
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+_FORCE_GB_THRESHOLD = 900 << 20  # Force GB for files larger than 900MB
+
+@lru_cache(maxsize=4096)
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human-readable format"""
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0 B"
     
-    # Force GB for files larger than 900MB
-    if size_bytes > 900 * 1024 * 1024:
-        return f"{size_bytes / (1024 * 1024 * 1024):.2f} GB"
-    
-    size_names = ("B", "KB", "MB", "GB", "TB")
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024
-        i += 1
+    if size_bytes > _FORCE_GB_THRESHOLD:
+        return f"{size_bytes / (1 << 30):.2f} GB"
     
-    return f"{size_bytes:.2f} {size_names[i]}"
+    # Pick the unit from the bit length instead of dividing in a loop
+    i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.2f} {_SIZE_UNITS[i]}"
 
 # Template filters
 @app.template_filter('timestamp_to_date')
@@ -140,21 +184,97 @@ def handle_errors(f):
             return redirect(url_for('index'))
     return decorated_function
 
+def _store_cached_response(key: str, entry: Tuple[float, bytes, int, str]) -> None:
+    """Add a response to the cache, evicting expired or oldest entries to bound its size"""
+    if key not in _response_cache and len(_response_cache) >= _RESPONSE_CACHE_MAX_ENTRIES:
+        now = time.time()
+        for stale_key, cached in list(_response_cache.items()):
+            if cached[0] <= now:
+                _response_cache.pop(stale_key, None)
+        # Still full, drop the oldest insertion
+        while len(_response_cache) >= _RESPONSE_CACHE_MAX_ENTRIES:
+            _response_cache.pop(next(iter(_response_cache)), None)
+    _response_cache[key] = entry
+
+# Response caching decorator
+def cached_response(timeout: int = _RESPONSE_CACHE_TTL):
+    """Decorator to cache successful responses of read-only routes, keyed by path.
+    
+    Cached routes must not depend on the query string, which clients control.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.path
+            current_time = time.time()
+            
+            # Return cached response if still valid
+            cached = _response_cache.get(key)
+            if cached is not None and current_time < cached[0]:
+                return Response(cached[1], status=cached[2], content_type=cached[3])
+            
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                _store_cached_response(key, (current_time + timeout, response.get_data(), response.status_code, response.content_type))
+            return response
+        return decorated_function
+    return decorator
+
 # Helpers
-def allowed_file(filename: str) -> bool:
-    """Check if file has an allowed extension"""
-    if '.' not in filename:
-        logger.warning(f"File '{filename}' has no extension and is not allowed")
-        return False
-    
-    extension = filename.rsplit('.', 1)[1].lower()
-    allowed_extensions = config_instance.get_allowed_extensions()
-    
-    if extension in allowed_extensions:
-        return True
-    else:
-        logger.warning(f"File extension '{extension}' from '{filename}' is not in allowed extensions: {allowed_extensions}")
-        return False
+def json_response(payload: Any) -> Response:
+    """Build a JSON response, using orjson when available as it is much faster than jsonify"""
+    return Response(serialization.dumps(payload), mimetype='application/json')
+
+def get_client_filename(filename: str) -> str:
+    """Strip any client-side directory from an uploaded filename"""
+    # On some mobile devices, the filename includes a path - extract just the filename
+    if '/' in filename:
+        return filename.split('/')[-1]
+    elif '\\' in filename:
+        return filename.split('\\')[-1]
+    return filename
+
+def get_upload_size(file) -> int:
+    """Determine the size of an uploaded file without reading it into memory"""
+    if file.content_length:
+        return file.content_length
+    
+    # Fall back to seeking the spooled temporary file backing the upload
+    stream = file.stream
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return 0
+
+def _copy_to_file(stream, filepath: str) -> os.stat_result:
+    """Copy a stream to a file in chunks and return the stat of the written file"""
+    with open(filepath, 'wb') as f:
+        shutil.copyfileobj(stream, f, length=CHUNK_SIZE)
+        f.flush()
+        # Stat the open file, the path may already be deleted or replaced
+        return os.fstat(f.fileno())
+
+def use_store_for_temp_files() -> None:
+    """Spool upload bodies on the first store's filesystem instead of TMPDIR, often a RAM-backed tmpfs"""
+    if os.environ.get('TMPDIR'):
+        # An explicit choice of temporary directory wins
+        return
+    stores = config_instance.get_enabled_stores()
+    if not stores:
+        return
+    temp_dir = os.path.join(stores[0]['path'], _UPLOAD_TEMP_DIR)
+    try:
+        os.makedirs(temp_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Cannot create {temp_dir}, upload bodies will be spooled to {tempfile.gettempdir()}: {e}")
+        return
+    # Waitress and the multipart parser both create their files through tempfile
+    tempfile.tempdir = temp_dir
+    logger.info(f"Spooling upload bodies to {temp_dir}")
 
 def get_ip_address() -> str:
     """Get the local IP address of the device"""
@@ -168,108 +288,139 @@ def get_ip_address() -> str:
         IP = '127.0.0.1'
     finally:
         s.close()
+    
     return IP
 
-def get_network_interfaces() -> List[Dict[str, str]]:
-    """Get all network interfaces and their IP addresses with caching"""
+def _refresh_network_interfaces() -> List[Dict[str, str]]:
+    """Scan the network interfaces and store the result in the cache"""
     global _network_interfaces_cache, _network_cache_timestamp
     
-    # Return cached value if still valid
-    current_time = time.time()
-    if _network_interfaces_cache is not None and current_time - _network_cache_timestamp < _NETWORK_CACHE_TTL:
-        return _network_interfaces_cache
-    
     interfaces = []
     try:
-        for interface_name in netifaces.interfaces():
-            addresses = netifaces.ifaddresses(interface_name)
-            if netifaces.AF_INET in addresses:
-                for link in addresses[netifaces.AF_INET]:
-                    ip_address = link['addr']
-                    if ip_address != '127.0.0.1':
-                        interfaces.append({
-                            'name': interface_name,
-                            'ip': ip_address
-                        })
+        # A single call returns the addresses of every interface
+        for interface_name, addresses in psutil.net_if_addrs().items():
+            for address in addresses:
+                if address.family == socket.AF_INET and address.address != '127.0.0.1':
+                    interfaces.append({
+                        'name': interface_name,
+                        'ip': address.address
+                    })
     except Exception as e:
         logger.error(f"Error getting network interfaces: {e}")
     
     # Update cache
     _network_interfaces_cache = interfaces
-    _network_cache_timestamp = current_time
+    _network_cache_timestamp = time.time()
     
     return interfaces
 
+def _network_refresher():
+    """Keep the network interface cache warm so requests never scan interfaces"""
+    while True:
+        time.sleep(_NETWORK_REFRESH_INTERVAL)
+        _refresh_network_interfaces()
+
+def get_network_interfaces() -> List[Dict[str, str]]:
+    """Get all network interfaces and their IP addresses with caching"""
+    # Return cached value if still valid
+    if _network_interfaces_cache is not None and time.time() - _network_cache_timestamp < _NETWORK_CACHE_TTL:
+        return _network_interfaces_cache
+    
+    return _refresh_network_interfaces()
+
+def _collect_store_info(numbered_store: Tuple[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Get disk usage and file count for one store"""
+    index, store = numbered_store
+    try:
+        total, used, free = config_instance.get_disk_usage(store['path'])
+        free_space_gb = free / (1024 ** 3)
+        total_gb = total / (1024 ** 3)
+        
+        # Count files in this store, scandir avoids a stat per entry
+        with os.scandir(store['path']) as entries:
+            file_count = sum(1 for entry in entries if entry.is_file())
+        
+        return {
+            'name': store['name'],
+            'path': store['path'],
+            'free_space_gb': round(free_space_gb, 2),
+            'total_space_gb': round(total_gb, 2),
+            'usage_percent': round((total - free) / total * 100, 2) if total > 0 else 0,
+            'store_number': index,  # Sequential number based on order in config
+            'file_count': file_count
+        }
+    except Exception as e:
+        logger.error(f"Error getting store info for {store['name']}: {e}")
+        # Include basic info
+        return {
+            'name': store['name'],
+            'path': store['path'],
+            'error': str(e),
+            'free_space_gb': 0,
+            'total_space_gb': 0,
+            'usage_percent': 0,
+            'store_number': index,
+            'file_count': 0
+        }
+
 def get_store_info() -> List[Dict[str, Any]]:
-    """Get information about all enabled trans stores"""
+    """Get information about all enabled trans stores with caching"""
+    global _store_info_cache, _store_info_cache_timestamp
+    
+    # Return cached value if still valid
+    current_time = time.time()
+    if _store_info_cache is not None and current_time - _store_info_cache_timestamp < _STORE_INFO_CACHE_TTL:
+        return _store_info_cache
+    
     stores = config_instance.get_enabled_stores()
-    store_info = []
     
-    for index, store in enumerate(stores, 1):
-        try:
-            free_space_gb = config_instance.get_store_free_space(store['path'])
-            total, used, free = shutil.disk_usage(store['path'])
-            total_gb = total / (1024 ** 3)
-            
-            # Count files in this store
-            file_count = 0
-            if os.path.exists(store['path']):
-                file_count = len([f for f in os.listdir(store['path']) if os.path.isfile(os.path.join(store['path'], f))])
-            
-            store_info.append({
-                'name': store['name'],
-                'path': store['path'],
-                'free_space_gb': round(free_space_gb, 2),
-                'total_space_gb': round(total_gb, 2),
-                'usage_percent': round((total - free) / total * 100, 2) if total > 0 else 0,
-                'store_number': index,  # Sequential number based on order in config
-                'file_count': file_count
-            })
-        except Exception as e:
-            logger.error(f"Error getting store info for {store['name']}: {e}")
-            # Include basic info
-            store_info.append({
-                'name': store['name'],
-                'path': store['path'],
-                'error': str(e),
-                'free_space_gb': 0,
-                'total_space_gb': 0,
-                'usage_percent': 0,
-                'store_number': index,
-                'file_count': 0
-            })
+    # Stat the stores in parallel so slow (e.g. network) mounts don't add up
+    with ThreadPoolExecutor(max_workers=max(len(stores), 1), thread_name_prefix='store-info') as executor:
+        store_info = list(executor.map(_collect_store_info, enumerate(stores, 1)))
+    
+    # Update cache
+    _store_info_cache = store_info
+    _store_info_cache_timestamp = current_time
     
     return store_info
 
+def invalidate_caches() -> None:
+    """Invalidate cached store information and responses after files change"""
+    global _store_info_cache
+    _store_info_cache = None
+    _response_cache.clear()
+
+@lru_cache(maxsize=128)
+def _mime_for_ext(ext: str) -> str:
+    """Look up the MIME type for a lowercase extension, cached per extension"""
+    return _mime_types.get(ext, _DEFAULT_MIME_TYPE)
+
 def get_mime_type(filename: str) -> str:
     """Determine MIME type based on file extension"""
-    default_mime = 'application/octet-stream'  # Default fallback
-    if '.' not in filename:
-        return default_mime
-        
-    ext = filename.rsplit('.', 1)[1].lower()
-    return _mime_types.get(ext, default_mime)
+    dot = filename.rfind('.')
+    if dot < 0:
+        return _DEFAULT_MIME_TYPE
+    
+    return _mime_for_ext(filename[dot + 1:].lower())
 
 # Register service with zeroconf for discovery
-def register_service(ip: str, port: int) -> Tuple[Zeroconf, ServiceInfo]:
-    """Register the service with zeroconf for discovery"""
-    app_config = config_instance.get_config()
-    service_name = app_config.get("service_name", "WiFi File Transfer")
-    
-    hostname = socket.gethostname()
-    info = ServiceInfo(
+@lru_cache(maxsize=4)
+def _build_service_info(ip: str, port: int) -> ServiceInfo:
+    """Build the zeroconf service info for an address, cached so re-registration is free"""
+    return ServiceInfo(
         "_wifitransfer._tcp.local.",
-        f"{hostname}._wifitransfer._tcp.local.",
+        f"{_HOSTNAME}._wifitransfer._tcp.local.",
         addresses=[socket.inet_aton(ip)],
         port=port,
-        properties={
-            b'name': service_name.encode('utf-8'),
-            b'path': b'/files'
-        }
+        properties=_SERVICE_PROPERTIES
     )
+
+def register_service(ip: str, port: int) -> Tuple[Zeroconf, ServiceInfo]:
+    """Register the service with zeroconf for discovery"""
+    info = _build_service_info(ip, port)
     
     zeroconf = Zeroconf()
-    logger.info(f"Registering service '{service_name}' on {ip}:{port}")
+    logger.info(f"Registering service '{_SERVICE_NAME}' on {ip}:{port}")
     try:
         zeroconf.register_service(info)
         return zeroconf, info
@@ -280,9 +431,11 @@ def register_service(ip: str, port: int) -> Tuple[Zeroconf, ServiceInfo]:
 # Route handlers
 @app.route('/')
 @handle_errors
+@cached_response()
 def index():
     """Render the home page"""
-    interfaces = get_network_interfaces()
+    # Fall back to the address found at startup if the scan found nothing
+    interfaces = get_network_interfaces() or [{'name': 'Primary', 'ip': app.config['PRIMARY_IP']}]
     
     # Get files from all enabled trans stores
     files = config_instance.get_all_files()
@@ -320,21 +473,40 @@ def upload_file():
         saved_files = []
         failed_files = []
         
+        # Reject disallowed file types up front, before any disk I/O
+        accepted = []
+        rejected = []
         for file in files:
             if file and file.filename:
-                try:
-                    # Process the file
-                    result = process_upload_file(file)
-                    if result['success']:
-                        saved_files.append(result['file_info'])
-                    else:
-                        failed_files.append(result['error'])
-                except Exception as e:
-                    logger.error(f"Error processing file {file.filename}: {e}", exc_info=True)
-                    failed_files.append({
-                        'name': file.filename,
-                        'error': str(e)
-                    })
+                name = get_client_filename(file.filename)
+                if config_instance.is_allowed_filename(name):
+                    accepted.append((file, name))
+                else:
+                    rejected.append(name)
+        
+        if rejected:
+            allowed = config_instance.get_allowed_extensions()
+            logger.warning(f"File types not allowed: {rejected}. Allowed extensions: {sorted(allowed)}")
+            for name in rejected:
+                failed_files.append({
+                    'name': name,
+                    'error': f'File type not allowed. Allowed types: {", ".join(sorted(allowed))}'
+                })
+        
+        for file, original_filename in accepted:
+            try:
+                # Process the file
+                result = process_upload_file(file, original_filename)
+                if result['success']:
+                    saved_files.append(result['file_info'])
+                else:
+                    failed_files.append(result['error'])
+            except Exception as e:
+                logger.error(f"Error processing file {file.filename}: {e}", exc_info=True)
+                failed_files.append({
+                    'name': file.filename,
+                    'error': str(e)
+                })
         
         # Show results
         if saved_files:
@@ -361,35 +533,15 @@ def upload_file():
     
     return render_template('upload.html', stores=stores, config=app_config)
 
-def process_upload_file(file) -> Dict[str, Any]:
-    """Process an uploaded file"""
-    original_filename = file.filename
-    
-    # On some mobile devices, the filename includes a path - extract just the filename
-    if '/' in original_filename:
-        original_filename = original_filename.split('/')[-1]
-    elif '\\' in original_filename:
-        original_filename = original_filename.split('\\')[-1]
-    
-    # Check file type
-    if not allowed_file(original_filename):
-        logger.warning(f"File type not allowed: {original_filename}")
-        return {
-            'success': False,
-            'error': {
-                'name': original_filename,
-                'error': f'File type not allowed. Allowed types: {", ".join(config_instance.get_allowed_extensions())}'
-            }
-        }
-    
+def process_upload_file(file, original_filename: str) -> Dict[str, Any]:
+    """Process an uploaded file whose type has already been validated"""
+    # Estimate the size without reading the upload into memory
+    return save_upload_stream(file.stream, original_filename, get_upload_size(file))
+
+def save_upload_stream(stream, original_filename: str, file_size: int) -> Dict[str, Any]:
+    """Stream upload data to the best store, file_size is the expected size used to pick the store"""
     filename = secure_filename(original_filename)
     
-    # Create a temporary file to get the size
-    temp_buffer = io.BytesIO()
-    file.save(temp_buffer)
-    file_size = temp_buffer.tell()
-    temp_buffer.seek(0)  # Reset file pointer for later use
-    
     # Check if file exceeds maximum allowed size
     max_file_size = config_instance.get_max_file_size()
     if file_size > max_file_size:
@@ -403,7 +555,7 @@ def process_upload_file(file) -> Dict[str, Any]:
         }
     
     # Find the best store for this file
-    store = config_instance.get_store_for_upload(file_size)
+    store = config_instance.get_store_for_upload(file_size, filename)
     
     if not store:
         logger.error(f"No suitable store found for file: {filename} ({format_file_size(file_size)})")
@@ -415,10 +567,41 @@ def process_upload_file(file) -> Dict[str, Any]:
             }
         }
         
-    # Save the file to the selected store
+    # Stream the file to the selected store in chunks
     filepath = os.path.join(store['path'], filename)
-    with open(filepath, 'wb') as f:
-        f.write(temp_buffer.getvalue())
+    try:
+        stat = _io_pool.submit(_copy_to_file, stream, filepath).result()
+    except Exception as e:
+        # Don't leave a partial file behind if the client disconnects
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+            # The cached free space was wrong, read it again next time
+            config_instance.invalidate_disk_usage(store['path'])
+        raise
+    
+    # The size estimate may have been missing, so re-check the actual size
+    file_size = stat.st_size
+    if file_size > max_file_size:
+        os.remove(filepath)
+        logger.warning(f"File too large: {filename} ({format_file_size(file_size)})")
+        return {
+            'success': False,
+            'error': {
+                'name': filename,
+                'error': f'File too large: {format_file_size(file_size)}. Maximum allowed size is {config_instance.get_config().get("max_file_size_gb", 16)}GB'
+            }
+        }
+    
+    # Add the new file to the files index and invalidate derived caches
+    config_instance.add_file(config.FileRecord(
+        name=filename,
+        path=filepath,
+        size=file_size,
+        modified=stat.st_mtime,
+        store_name=store['name']
+    ))
+    invalidate_caches()
     
     logger.info(f"Saved file: {filename} ({format_file_size(file_size)}) to {store['name']}")
     return {
@@ -431,57 +614,62 @@ def process_upload_file(file) -> Dict[str, Any]:
         }
     }
 
+@app.route('/upload-raw/<filename>', methods=['PUT', 'POST'])
+@handle_errors
+def upload_raw(filename: str):
+    """Upload a single file sent as the raw request body, bypassing multipart parsing"""
+    original_filename = get_client_filename(filename)
+    if not config_instance.is_allowed_filename(original_filename):
+        allowed = config_instance.get_allowed_extensions()
+        logger.warning(f"File type not allowed: {original_filename}")
+        return jsonify({
+            'success': False,
+            'error': f'File type not allowed. Allowed types: {", ".join(sorted(allowed))}'
+        }), 400
+    
+    # The size is needed up front to pick a store
+    if request.content_length is None:
+        return jsonify({'success': False, 'error': 'Content-Length header is required'}), 411
+    
+    result = save_upload_stream(request.stream, original_filename, request.content_length)
+    if not result['success']:
+        return jsonify({'success': False, 'error': result['error']['error']}), 400
+    
+    file_info = result['file_info']
+    return jsonify({
+        'success': True,
+        'name': file_info['name'],
+        'store': file_info['store'],
+        'size': file_info['size']
+    }), 201
+
 @app.route('/download/<filename>')
 @handle_errors
 def download_file(filename: str):
-    """Download a file with support for streaming large files"""
-    # Search for the file in all enabled stores
-    all_files = config_instance.get_all_files()
-    file_info = next((f for f in all_files if f['name'] == filename), None)
+    """Download a file with support for resumable (Range) requests"""
+    # Look up the file across all enabled stores
+    file_info = config_instance.get_file_by_name(filename)
     
     if not file_info:
         flash('File not found')
         return redirect(url_for('index'))
     
-    filepath = file_info['path']
-    file_size = file_info['size']
+    filepath = file_info.path
+    file_size = file_info.size
     mime_type = get_mime_type(filename)
     
     logger.info(f"Serving file: {filename} ({format_file_size(file_size)}) as {mime_type}")
     
     try:
-        # For small files (<50MB), serve directly rather than streaming for better Android compatibility
-        if file_size < SMALL_FILE_THRESHOLD:
-            return send_from_directory(
-                directory=os.path.dirname(filepath),
-                path=os.path.basename(filepath),
-                mimetype=mime_type,
-                as_attachment=True,
-                download_name=filename
-            )
-        
-        # For larger files, use streaming
-        def generate() -> Generator[bytes, None, None]:
-            with open(filepath, 'rb') as f:
-                while True:
-                    chunk = f.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    yield chunk
-        
-        headers = {
-            'Content-Disposition': f'attachment; filename="{filename}"',
-            'Content-Length': str(file_size),
-            'X-File-Size': str(file_size),
-            'Cache-Control': 'no-cache',
-            'Content-Type': mime_type
-        }
-        
-        return Response(
-            stream_with_context(generate()),
-            headers=headers,
+        # send_file handles files of any size, supports Range requests for
+        # resumable downloads and lets the server use sendfile when available
+        return send_file(
+            filepath,
             mimetype=mime_type,
-            direct_passthrough=True
+            as_attachment=True,
+            download_name=filename,
+            conditional=True,
+            etag=True
         )
     except Exception as e:
         logger.error(f"Error serving file {filename}: {str(e)}", exc_info=True)
@@ -492,34 +680,37 @@ def download_file(filename: str):
 @handle_errors
 def file_info(filename: str):
     """Get information about a file"""
-    all_files = config_instance.get_all_files()
-    file_info = next((f for f in all_files if f['name'] == filename), None)
+    file_info = config_instance.get_file_by_name(filename)
     
     if not file_info:
         return jsonify({'error': 'File not found'}), 404
     
     return jsonify({
         'name': filename,
-        'size': file_info['size'],
-        'size_formatted': format_file_size(file_info['size']),
-        'modified': file_info['modified'],
-        'store': file_info['store_name']
+        'size': file_info.size,
+        'size_formatted': format_file_size(file_info.size),
+        'modified': file_info.modified,
+        'store': file_info.store_name
     })
 
 @app.route('/delete/<filename>', methods=['POST'])
 @handle_errors
 def delete_file(filename: str):
     """Delete a file"""
-    all_files = config_instance.get_all_files()
-    file_info = next((f for f in all_files if f['name'] == filename), None)
+    file_info = config_instance.get_file_by_name(filename)
     
     if file_info:
-        filepath = file_info['path']
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            logger.info(f"Deleted file: {filename} from {file_info['store_name']}")
-            # Refresh the files cache
-            config_instance.get_all_files(force_refresh=True)
+        try:
+            os.remove(file_info.path)
+        except FileNotFoundError:
+            # Already gone from disk, drop the stale index entry
+            config_instance.remove_file(filename)
+            invalidate_caches()
+        else:
+            logger.info(f"Deleted file: {filename} from {file_info.store_name}")
+            # Remove the file from the files index and invalidate derived caches
+            config_instance.remove_file(filename)
+            invalidate_caches()
             return jsonify({'success': True})
     
     logger.warning(f"Failed to delete file: {filename}")
@@ -529,60 +720,67 @@ def delete_file(filename: str):
 @handle_errors
 def list_files():
     """API endpoint to list all files"""
-    all_files = config_instance.get_all_files()
-    
-    # Format for API response
-    files_api = []
-    for file in all_files:
-        files_api.append({
-            'name': file['name'],
-            'size': file['size'],
-            'size_formatted': format_file_size(file['size']),
-            'modified': file['modified'],
-            'download_url': f"/download/{file['name']}",
-            'store': file['store_name']
-        })
-    
-    return jsonify(files_api)
+    global _files_api_cache
+    
+    # The file list is rebuilt whenever a store changes, so reuse the
+    # serialized payload for as long as the same list is returned
+    files = config_instance.get_all_files()
+    cached = _files_api_cache
+    if cached is None or cached[0] is not files:
+        payload = serialization.dumps([{
+            'name': file.name,
+            'size': file.size,
+            'size_formatted': format_file_size(file.size),
+            'modified': file.modified,
+            'download_url': f"/download/{file.name}",
+            'store': file.store_name
+        } for file in files])
+        cached = _files_api_cache = (files, payload)
+    
+    return Response(cached[1], mimetype='application/json')
 
 @app.route('/api/stores')
 @handle_errors
+@cached_response()
 def stores_info():
     """API endpoint to get store information"""
-    return jsonify(get_store_info())
+    return json_response(get_store_info())
 
 @app.route('/api/config')
 @handle_errors
+@cached_response(timeout=60)
 def config_info():
     """API endpoint to get configuration information"""
     app_config = config_instance.get_config()
     # Only expose necessary configuration
-    return jsonify({
+    return json_response({
         'service_name': app_config.get('service_name', 'WiFi File Transfer'),
         'max_file_size_gb': app_config.get('max_file_size_gb', 16),
-        'allowed_extensions': list(config_instance.get_allowed_extensions())
+        'allowed_extensions': sorted(config_instance.get_allowed_extensions())
     })
 
 @app.route('/direct-download/<filename>')
 @handle_errors
 def direct_download(filename: str):
     """A simpler download route for better Android compatibility"""
-    all_files = config_instance.get_all_files()
-    file_info = next((f for f in all_files if f['name'] == filename), None)
+    file_info = config_instance.get_file_by_name(filename)
     
     if not file_info:
         flash('File not found')
         return redirect(url_for('index'))
     
-    filepath = file_info['path']
+    filepath = file_info.path
     
     # For Android, simpler direct download is more reliable
     try:
+        # Conditional responses allow resuming interrupted downloads via Range
         return send_from_directory(
             directory=os.path.dirname(filepath),
             path=os.path.basename(filepath),
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            conditional=True,
+            etag=True
         )
     except Exception as e:
         logger.error(f"Error serving file {filename}: {str(e)}", exc_info=True)
@@ -602,11 +800,26 @@ def server_error(e):
     return render_template('error.html', error='Server error'), 500
 
 # Main entry point
+# The primary address is resolved once and shared by the routes and zeroconf
+app.config['PRIMARY_IP'] = get_ip_address()
+
 if __name__ == '__main__':
-    ip = get_ip_address()
+    ip = app.config['PRIMARY_IP']
     
-    # Register with zeroconf in a separate thread
-    zeroconf, info = register_service(ip, args.port)
+    # Register with zeroconf in a separate thread so the server starts immediately
+    registration = queue.Queue(maxsize=1)
+    threading.Thread(
+        target=lambda: registration.put(register_service(ip, args.port)),
+        name='zeroconf-register',
+        daemon=True
+    ).start()
+    
+    # Multi-GB uploads are spooled to disk twice before the copy to the store
+    use_store_for_temp_files()
+    
+    # Refresh the interface list in the background instead of on page loads
+    _refresh_network_interfaces()
+    threading.Thread(target=_network_refresher, name='network-refresh', daemon=True).start()
     
     try:
         logger.info("=" * 50)
@@ -622,12 +835,28 @@ if __name__ == '__main__':
         print(f"Using configuration file: {config_instance.config_file}")
         print("=" * 50)
         
-        app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False)
+        if args.debug:
+            # Werkzeug development server with the interactive debugger
+            app.run(host=args.host, port=args.port, debug=True, use_reloader=False, threaded=True)
+        else:
+            # Production WSGI server - a pool of worker threads serves transfers
+            # concurrently and file responses go through wsgi.file_wrapper.
+            # Waitress spools each request body to a temporary file before
+            # calling the app and the multipart parser spools the part again,
+            # see use_store_for_temp_files for where those files go.
+            # Its own body limit defaults to 1GB and must cover the app's
+            # limit plus multipart framing
+            app.debug = False
+            serve(app, host=args.host, port=args.port, threads=8, asyncore_use_poll=True,
+                  max_request_body_size=app.config['MAX_CONTENT_LENGTH'] + _MULTIPART_OVERHEAD)
     finally:
         # Unregister on shutdown
         logger.info("Unregistering service...")
         try:
+            zeroconf, info = registration.get(timeout=5)
             zeroconf.unregister_service(info)
             zeroconf.close()
+        except queue.Empty:
+            logger.warning("Service was never registered, nothing to unregister")
         except Exception as e:
             logger.error(f"Error unregistering service: {e}") 
\ No newline at end of file
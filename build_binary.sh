@@ -88,7 +88,7 @@ if [ -f "$APP_DIR/requirements.txt" ]; then
     pip3 install -r "$APP_DIR/requirements.txt"
 else
     log_warning "requirements.txt not found. Installing basic dependencies..."
-    pip3 install flask flask-cors netifaces zeroconf
+    pip3 install flask flask-cors psutil orjson waitress zeroconf
 fi
 
 # Create the build directory if it doesn't exist
@@ -110,7 +110,7 @@ a = Analysis(['app.py'],
              pathex=['$APP_DIR'],
              binaries=[],
              datas=[('static', 'static'), ('templates', 'templates')],
-             hiddenimports=['flask', 'werkzeug', 'jinja2', 'flask_cors', 'netifaces', 'zeroconf'],
+             hiddenimports=['flask', 'werkzeug', 'jinja2', 'flask_cors', 'psutil', 'orjson', 'waitress', 'zeroconf'],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
@@ -4,12 +4,20 @@ This file defines the available storage locations (trans stores) and other setti
 """
 
 import os
-import json
+import heapq
+import serialization
 import logging
+import re
+import secrets
 import shutil
+import threading
+import time
 from pathlib import Path
-from functools import lru_cache
-from typing import Dict, List, Optional, Set, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from operator import attrgetter
+from typing import Dict, FrozenSet, Iterator, List, Mapping, NamedTuple, Optional, Pattern, Tuple, Any, Union
 
 # Get the logger for this module
 logger = logging.getLogger('wifi_file_transfer.config')
@@ -30,19 +38,67 @@ DEFAULT_CONFIG = {
     ]
 }
 
+# A GB is exactly 2**30 bytes
+_GB_SHIFT = 30
+
+def gb_to_bytes(size_gb: Union[int, float]) -> int:
+    """Convert a size in GB to bytes, shifting whole numbers to stay in integer math"""
+    if isinstance(size_gb, int):
+        return size_gb << _GB_SHIFT
+    return int(size_gb * (1 << _GB_SHIFT))
+
+# Defaults in the form they are used at runtime, built once at import
+_DEFAULT_ALLOWED_EXTENSIONS = frozenset(DEFAULT_CONFIG['allowed_extensions'])
+_DEFAULT_MAX_FILE_SIZE = gb_to_bytes(DEFAULT_CONFIG['max_file_size_gb'])
+
+class FileRecord(NamedTuple):
+    """A file in one of the trans stores, as recorded in the files index"""
+    name: str
+    path: str
+    size: int
+    modified: float
+    store_name: str
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Immutable view of the loaded configuration in the form request paths use it"""
+    enabled_stores: Tuple[Dict[str, Any], ...]
+    stores_by_name: Mapping[str, Dict[str, Any]]
+    max_file_size: int
+    allowed_extensions: FrozenSet[str]
+    ext_regex: Pattern[str]
+
 class Configuration:
     """Singleton class to manage application configuration with efficient caching."""
     
     _instance = None
+    _instance_lock = threading.Lock()
     
     # Constants for unit conversions
-    _GB_TO_BYTES = 1024 * 1024 * 1024
+    _GB_TO_BYTES = 1 << _GB_SHIFT
+    
+    # Disk usage changes slowly, reuse statvfs results for a short time.
+    # Writes made through this process are applied to the cached value
+    _DISK_USAGE_TTL = 5.0  # seconds
+    
+    # Minimum time between stats of the config file
+    _CONFIG_STAT_INTERVAL_NS = 10**9  # 1 second
+    
+    # File next to the configuration holding the persistent secret key
+    _SECRET_KEY_FILE = '.secret_key'
+    
+    # Directory mtimes newer than this may not reflect changes made within
+    # the same timestamp tick (coarse mtimes on FAT/exFAT), so don't trust them
+    _DIR_MTIME_SLACK_NS = 2 * 1000 * 1000 * 1000
 
     @classmethod
     def get_instance(cls) -> 'Configuration':
         """Get the singleton instance of Configuration"""
+        # Only take the lock while the instance hasn't been created yet
         if cls._instance is None:
-            cls._instance = Configuration()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = Configuration()
         return cls._instance
 
     def __init__(self) -> None:
@@ -50,9 +106,23 @@ class Configuration:
         # Default configuration file path
         self.config_file = 'config.json'
         self._config_data = None
-        self._stores_cache = None
+        # Serializes config parsing and store rescans, re-entrant because a
+        # rescan may trigger a config reload
+        self._refresh_lock = threading.RLock()
+        # Modification time (ns) of the config file when it was last loaded
+        self._config_mtime_ns = None
+        self._last_config_stat_ns = 0
+        # Derived config, replaced as a whole when the config is reloaded
+        self._snapshot = None
         self._all_files_cache = None
-        self._cache_timestamp = 0
+        self._files_by_name = None
+        # Per-store file listings keyed by store path:
+        # (directory mtime ns, files, wall time ns after which to rescan or None)
+        self._dir_cache = {}
+        # Bytes used by the files in each store keyed by store path
+        self._store_bytes = {}
+        # Disk usage keyed by path: (monotonic time, (total, used, free))
+        self._disk_usage_cache = {}
         
     def set_config_file(self, path: str) -> str:
         """Set the configuration file path and reset caches"""
@@ -64,18 +134,80 @@ class Configuration:
     
     def clear_caches(self) -> None:
         """Clear all cached data to force reloading from disk"""
+        with self._refresh_lock:
+            self._clear_caches()
+
+    def _clear_caches(self) -> None:
+        """Reset every cache, the caller holds the refresh lock"""
         self._config_data = None
-        self._stores_cache = None
+        self._config_mtime_ns = None
+        self._last_config_stat_ns = 0
+        self._snapshot = None
         self._all_files_cache = None
-        self._cache_timestamp = 0
-        # Clear lru_cache decorated methods
-        self.get_allowed_extensions.cache_clear()
-        self.get_max_file_size.cache_clear()
+        self._files_by_name = None
+        self._dir_cache = {}
+        self._store_bytes = {}
 
     def config_dir(self) -> str:
         """Get the directory containing the configuration file"""
         return os.path.dirname(self.config_file) or '.'
         
+    def get_or_create_secret_key(self) -> bytes:
+        """Get the persistent secret key, creating it next to the config file if missing"""
+        key_path = os.path.join(self.config_dir(), self._SECRET_KEY_FILE)
+        try:
+            with open(key_path, 'rb') as f:
+                key = f.read()
+            if key:
+                return key
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Error reading secret key from {key_path}: {e}")
+        
+        key = secrets.token_bytes(32)
+        tmp_path = f"{key_path}.{os.getpid()}"
+        try:
+            # Only the owner should be able to read the key
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(key)
+            try:
+                # Linking fails if the key exists, so processes starting
+                # together all end up using the first complete key
+                os.link(tmp_path, key_path)
+                logger.info(f"Created secret key file: {key_path}")
+            except FileExistsError:
+                key = self._read_existing_secret_key(key_path, tmp_path, key)
+            except OSError as e:
+                # No hard links on this filesystem (FAT/exFAT, many SMB/FUSE
+                # mounts), an exclusive create gives the same first-wins result
+                logger.debug(f"Cannot link secret key file, creating it directly: {e}")
+                try:
+                    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                except FileExistsError:
+                    key = self._read_existing_secret_key(key_path, tmp_path, key)
+                else:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(key)
+                    logger.info(f"Created secret key file: {key_path}")
+        except OSError as e:
+            logger.warning(f"Error saving secret key to {key_path}, sessions will not survive restarts: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return key
+        
+    @staticmethod
+    def _read_existing_secret_key(key_path: str, tmp_path: str, key: bytes) -> bytes:
+        """Use the key another process saved first, replacing the file with ours if it is empty"""
+        with open(key_path, 'rb') as f:
+            existing = f.read()
+        if existing:
+            return existing
+        os.replace(tmp_path, key_path)
+        return key
+        
     def create_default_config(self) -> Dict[str, Any]:
         """Create a default configuration file if it doesn't exist"""
         # Check if file exists
@@ -87,11 +219,12 @@ class Configuration:
                 os.makedirs(config_dir, exist_ok=True)
                 
             logger.info(f"Creating default configuration file: {self.config_file}")
-            with open(self.config_file, 'w') as f:
-                json.dump(DEFAULT_CONFIG, f, indent=4)
+            with open(self.config_file, 'wb') as f:
+                f.write(serialization.dumps_pretty(DEFAULT_CONFIG))
             logger.info(f"Default configuration file created successfully")
             # Set the default config as our in-memory config
             self._config_data = DEFAULT_CONFIG.copy()
+            self._config_mtime_ns = os.stat(self.config_file).st_mtime_ns
         else:
             logger.info(f"Configuration file already exists: {self.config_file}")
             # Load the existing configuration
@@ -109,9 +242,9 @@ class Configuration:
         for store in self.get_config().get('trans_stores', []):
             if store.get('enabled', True):
                 path = store.get('path')
-                if path:
+                if path and not os.path.isdir(path):
                     try:
-                        logger.info(f"Ensuring trans store directory exists: {path}")
+                        logger.info(f"Creating trans store directory: {path}")
                         os.makedirs(path, exist_ok=True)
                     except (PermissionError, OSError) as e:
                         # Store isn't accessible - log and add to list of inaccessible stores
@@ -140,22 +273,34 @@ class Configuration:
         if len(inaccessible_stores) < len(self.get_config().get('trans_stores', [])):
             # We still have some accessible stores - create a temporary runtime config
             logger.info("Creating temporary runtime config with only accessible stores")
-            # Filter out inaccessible stores
+            # Filter out inaccessible stores with a set lookup per store
+            inaccessible_names = frozenset(ias['name'] for ias in inaccessible_stores)
             accessible_stores = [s for s in self.get_config().get('trans_stores', []) 
-                               if not any(ias['name'] == s['name'] for ias in inaccessible_stores)]
+                               if s.get('name') not in inaccessible_names]
             temp_config = self.get_config().copy()
             temp_config['trans_stores'] = accessible_stores
             # Only update in-memory config, don't save to disk
             self._config_data = temp_config
-            # Force refresh of stores cache
-            self._stores_cache = None
+            # Force refresh of the derived config
+            self._snapshot = None
 
     def _load_config_from_file(self) -> Dict[str, Any]:
-        """Low level method to load configuration directly from file"""
+        """Low level method to load configuration directly from file, skipped if unchanged"""
         try:
-            with open(self.config_file, 'r') as f:
-                self._config_data = json.load(f)
-            return self._config_data
+            stat = os.stat(self.config_file)
+            if self._config_data is not None and stat.st_mtime_ns == self._config_mtime_ns:
+                return self._config_data
+            with self._refresh_lock:
+                # Another thread may have parsed the file while we waited
+                if self._config_data is not None and stat.st_mtime_ns == self._config_mtime_ns:
+                    return self._config_data
+                # Remember the mtime even if parsing fails so a broken file isn't re-read on every call
+                self._config_mtime_ns = stat.st_mtime_ns
+                # Read into a buffer rather than mapping the file, a mapped file
+                # truncated by an editor mid-parse would kill the process with SIGBUS
+                with open(self.config_file, 'rb') as f:
+                    self._config_data = serialization.loads(f.read())
+                return self._config_data
         except Exception as e:
             logger.error(f"Error loading configuration: {e}")
             self._config_data = DEFAULT_CONFIG.copy()
@@ -179,8 +324,8 @@ class Configuration:
             if config_dir and not os.path.exists(config_dir):
                 os.makedirs(config_dir, exist_ok=True)
                 
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=4)
+            with open(self.config_file, 'wb') as f:
+                f.write(serialization.dumps_pretty(config))
             # Update in-memory config
             self._config_data = config
             # Clear caches since config has changed
@@ -198,93 +343,164 @@ class Configuration:
         
     def is_config_stale(self) -> bool:
         """Check if the config file has been modified since last load"""
-        if not os.path.exists(self.config_file):
+        # Skip the stat if the file was checked very recently
+        now = time.monotonic_ns()
+        if now - self._last_config_stat_ns < self._CONFIG_STAT_INTERVAL_NS:
+            return False
+        self._last_config_stat_ns = now
+        try:
+            return os.stat(self.config_file).st_mtime_ns != self._config_mtime_ns
+        except OSError:
             return False
-            
-        current_mtime = os.path.getmtime(self.config_file)
-        return current_mtime > self._cache_timestamp
 
     def reload_if_needed(self) -> bool:
         """Reload config if the file has changed on disk"""
         if self.is_config_stale():
-            logger.info(f"Configuration file has changed, reloading")
-            self.clear_caches()
-            self.load_config()
+            # Hold the refresh lock so readers never see the caches half cleared
+            with self._refresh_lock:
+                logger.info(f"Configuration file has changed, reloading")
+                self.clear_caches()
+                self.load_config()
             return True
         return False
 
-    def get_enabled_stores(self) -> List[Dict[str, Any]]:
-        """Get a list of all enabled trans stores with caching"""
-        # Check if config is stale before using cache
+    def _get_snapshot(self) -> ConfigSnapshot:
+        """Get the derived config, rebuilding it after the config file changes"""
+        # Check if config is stale before using the snapshot
         self.reload_if_needed()
         
-        # Use cached value if available
-        if self._stores_cache is not None:
-            return self._stores_cache
-            
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Build under the lock so a concurrent reload can't clear the config
+            # mid-build or be overwritten by a snapshot of the old config
+            with self._refresh_lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    snapshot = self._build_snapshot(self.get_config())
+                    # Readers holding the previous snapshot keep a consistent view
+                    self._snapshot = snapshot
+        return snapshot
+
+    def _build_snapshot(self, config: Dict[str, Any]) -> ConfigSnapshot:
+        """Resolve stores, limits and extensions from a loaded config"""
         stores = []
+        stores_by_name = {}
         
-        for store in self.get_config().get('trans_stores', []):
+        for store in config.get('trans_stores', []):
             if store.get('enabled', True):
                 # Make a copy to avoid modifying the original
                 store_copy = store.copy()
                 
                 # Add backwards compatibility for max_size vs max_size_gb
                 self._normalize_store_size_fields(store_copy)
+                # Byte limit used on every upload, computed once per load
+                store_copy['_max_size_bytes'] = self._compute_store_max_size(store_copy)
                 
                 stores.append(store_copy)
+                # First store wins if names are duplicated
+                stores_by_name.setdefault(store_copy.get('name'), store_copy)
         
-        # Cache the result
-        self._stores_cache = stores
-        return stores
+        # Get max file size in GB, then convert to bytes
+        max_size_gb = config.get('max_file_size_gb')
+        max_file_size = _DEFAULT_MAX_FILE_SIZE if max_size_gb is None else gb_to_bytes(max_size_gb)
+        
+        extensions = config.get('allowed_extensions')
+        if extensions is None:
+            allowed_extensions = _DEFAULT_ALLOWED_EXTENSIONS
+        else:
+            allowed_extensions = frozenset(ext.lower() for ext in extensions)
+        
+        return ConfigSnapshot(
+            enabled_stores=tuple(stores),
+            stores_by_name=MappingProxyType(stores_by_name),
+            max_file_size=max_file_size,
+            allowed_extensions=allowed_extensions,
+            ext_regex=self._compile_extension_pattern(allowed_extensions)
+        )
+
+    @staticmethod
+    def _compile_extension_pattern(extensions: FrozenSet[str]) -> Pattern[str]:
+        """Compile a case-insensitive pattern matching any allowed extension at the end of a name"""
+        if not extensions:
+            # Nothing is allowed, use a pattern that never matches
+            return re.compile(r'(?!)')
+        alternatives = '|'.join(re.escape(ext) for ext in sorted(extensions))
+        return re.compile(rf'\.(?:{alternatives})\Z', re.IGNORECASE)
+
+    def get_enabled_stores(self) -> Tuple[Dict[str, Any], ...]:
+        """Get all enabled trans stores with caching"""
+        return self._get_snapshot().enabled_stores
 
     def _normalize_store_size_fields(self, store: Dict[str, Any]) -> None:
         """Normalize size fields in store config for backwards compatibility"""
         if 'max_size_gb' in store and 'max_size' not in store:
             # Convert GB to bytes
-            store['max_size'] = store['max_size_gb'] * self._GB_TO_BYTES if store['max_size_gb'] > 0 else 0
+            store['max_size'] = gb_to_bytes(store['max_size_gb']) if store['max_size_gb'] > 0 else 0
         elif 'max_size' in store and 'max_size_gb' not in store:
             # Calculate GB from bytes for display purposes
             store['max_size_gb'] = store['max_size'] / self._GB_TO_BYTES if store['max_size'] > 0 else 0
 
     def get_store_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """Get a store by its name with efficient lookup"""
-        for store in self.get_enabled_stores():
-            if store.get('name') == name:
-                return store
-        return None
+        return self._get_snapshot().stores_by_name.get(name)
 
-    @lru_cache(maxsize=1)
     def get_max_file_size(self) -> int:
         """Get the maximum allowed file size in bytes with caching"""
-        # Get max file size in GB, then convert to bytes
-        max_size_gb = self.get_config().get('max_file_size_gb', DEFAULT_CONFIG['max_file_size_gb'])
-        return max_size_gb * self._GB_TO_BYTES  # Convert GB to bytes
+        return self._get_snapshot().max_file_size
+
+    def get_allowed_extensions(self) -> FrozenSet[str]:
+        """Get the allowed file extensions, rebuilt only when the config file changes"""
+        return self._get_snapshot().allowed_extensions
+
+    def is_allowed_filename(self, filename: str) -> bool:
+        """Check if a filename ends with one of the allowed extensions"""
+        return self._get_snapshot().ext_regex.search(filename) is not None
+
+    def get_disk_usage(self, path: str) -> Tuple[int, int, int]:
+        """Get (total, used, free) bytes for a path, cached for a short time"""
+        now = time.monotonic()
+        cached = self._disk_usage_cache.get(path)
+        if cached is not None and now - cached[0] < self._DISK_USAGE_TTL:
+            return cached[1]
+        
+        usage = shutil.disk_usage(path)
+        self._disk_usage_cache[path] = (now, usage)
+        return usage
 
-    @lru_cache(maxsize=1)
-    def get_allowed_extensions(self) -> Set[str]:
-        """Get the list of allowed file extensions with caching"""
-        return set(self.get_config().get('allowed_extensions', DEFAULT_CONFIG['allowed_extensions']))
+    def invalidate_disk_usage(self, path: str) -> None:
+        """Drop the cached disk usage for a path, e.g. after running out of space"""
+        self._disk_usage_cache.pop(path, None)
 
-    def get_store_free_space(self, store_path: str) -> float:
-        """Get the available free space in a store in GB"""
+    def get_store_free_bytes(self, store_path: str) -> int:
+        """Get the available free space in a store in bytes"""
         try:
-            # Check if path exists and is accessible first
-            if not os.path.exists(store_path):
-                logger.warning(f"Store path does not exist: {store_path}")
-                return 0
-                
-            total, used, free = shutil.disk_usage(store_path)
-            free_gb = free / self._GB_TO_BYTES  # Convert to GB
-            return free_gb
+            total, used, free = self.get_disk_usage(store_path)
+            return free
+        except FileNotFoundError:
+            logger.warning(f"Store path does not exist: {store_path}")
+            return 0
         except Exception as e:
             logger.error(f"Error getting free space for {store_path}: {e}")
             return 0
 
-    def get_store_for_upload(self, file_size: int) -> Optional[Dict[str, Any]]:
+    def get_store_free_space(self, store_path: str) -> float:
+        """Get the available free space in a store in GB"""
+        return self.get_store_free_bytes(store_path) / self._GB_TO_BYTES
+
+    def get_store_for_upload(self, file_size: int, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Find the best store for uploading a file based on available space and order in config"""
         stores = self.get_enabled_stores()
         
+        existing = self.get_file_by_name(filename) if filename is not None else None
+        if existing is not None:
+            # Overwrite in place, a copy in another store would be shadowed
+            # by this one the next time the stores are rescanned
+            store = self.get_store_by_name(existing.store_name)
+            if store is not None:
+                stores = (store,)
+                # The old copy is truncated before the new data is written
+                file_size = max(0, file_size - existing.size)
+        
         for store in stores:
             path = store.get('path')
             
@@ -296,7 +512,7 @@ class Configuration:
                 os.makedirs(path, exist_ok=True)
             
             # Get available space
-            free_space = self.get_store_free_space(path) * self._GB_TO_BYTES  # Convert GB to bytes
+            free_space = self.get_store_free_bytes(path)
             
             # Check if this store has enough space
             if file_size <= free_space:
@@ -313,74 +529,234 @@ class Configuration:
         logger.warning(f"No suitable store found for upload of {file_size} bytes")
         return None
 
-    def _get_store_max_size(self, store: Dict[str, Any]) -> int:
-        """Get the maximum size of a store in bytes"""
+    def _compute_store_max_size(self, store: Dict[str, Any]) -> int:
+        """Compute the maximum size of a store in bytes from its config fields"""
         if 'max_size_gb' in store:
             max_store_size_gb = store.get('max_size_gb', 0)
-            return max_store_size_gb * self._GB_TO_BYTES if max_store_size_gb > 0 else 0
+            return gb_to_bytes(max_store_size_gb) if max_store_size_gb > 0 else 0
         else:
             return store.get('max_size', 0)  # 0 means unlimited
+
+    def _get_store_max_size(self, store: Dict[str, Any]) -> int:
+        """Get the maximum size of a store in bytes"""
+        max_size = store.get('_max_size_bytes')
+        return max_size if max_size is not None else self._compute_store_max_size(store)
             
+    def _get_store_bytes(self, path: str) -> int:
+        """Get the bytes used by a store, scanning it only the first time"""
+        current_size = self._store_bytes.get(path)
+        if current_size is None:
+            with os.scandir(path) as entries:
+                current_size = sum(entry.stat().st_size for entry in entries if entry.is_file())
+            self._store_bytes[path] = current_size
+        return current_size
+
+    def _adjust_store_bytes(self, store_name: str, delta: int) -> None:
+        """Apply a size change to a store's byte counter and cached disk usage"""
+        store = self.get_store_by_name(store_name)
+        if store is None:
+            return
+        path = store.get('path')
+        if path in self._store_bytes:
+            self._store_bytes[path] += delta
+        cached = self._disk_usage_cache.get(path)
+        if cached is not None:
+            timestamp, usage = cached
+            self._disk_usage_cache[path] = (timestamp, usage._replace(used=usage.used + delta, free=usage.free - delta))
+
     def _store_can_fit_file(self, path: str, file_size: int, max_store_size: int) -> bool:
         """Check if a file can fit in a store without exceeding maximum size"""
-        # Calculate current store size
-        current_size = sum(os.path.getsize(os.path.join(path, f)) 
-                           for f in os.listdir(path) 
-                           if os.path.isfile(os.path.join(path, f)))
+        current_size = self._get_store_bytes(path)
         
         # Check if adding this file would exceed the store's max size
         return current_size + file_size <= max_store_size
 
-    def get_all_files(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
-        """Get a list of all files from all enabled trans stores with caching"""
-        # Force refresh or reload if needed
-        if force_refresh or self.reload_if_needed() or self._all_files_cache is None:
-            self._refresh_files_cache()
+    def get_all_files(self, force_refresh: bool = False, limit: Optional[int] = None) -> List[FileRecord]:
+        """Get a list of all files from all enabled trans stores with caching, optionally only the first `limit`"""
+        index = self._ensure_files_index(force_refresh)
+        files = self._all_files_cache
+        
+        if files is None:
+            if limit is not None:
+                # Only a prefix is needed, avoid sorting the whole index
+                return heapq.nsmallest(limit, list(index.values()), key=attrgetter('name'))
             
-        return self._all_files_cache
+            # Rebuild the sorted list from the index after incremental updates
+            files = sorted(index.values(), key=attrgetter('name'))
+            with self._refresh_lock:
+                # Don't cache a list built from an index that was replaced meanwhile
+                if self._files_by_name is index:
+                    self._all_files_cache = files
         
-    def _refresh_files_cache(self) -> None:
-        """Refresh the files cache"""
+        if limit is not None:
+            return files[:limit]
+        return files
+
+    def _ensure_files_index(self, force_refresh: bool = False) -> Dict[str, FileRecord]:
+        """Get the name index, rescanning the stores if forced, the config changed or the index has expired"""
+        index = self._files_by_name
+        if (force_refresh or self.reload_if_needed() or index is None
+                or self._stores_changed()):
+            # Only one thread rescans, the others wait and reuse its result
+            with self._refresh_lock:
+                index = self._files_by_name
+                if force_refresh or index is None or self._stores_changed():
+                    index = self._refresh_files_cache()
+        # Callers use the returned index, the attribute may be reset by another thread
+        return index
+
+    def _dir_mtime(self, path: str) -> Optional[int]:
+        """Get the modification time of a store directory in ns, None if missing"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _stores_changed(self) -> bool:
+        """Check if any store directory changed since it was last scanned"""
+        for store in self.get_enabled_stores():
+            if not self._dir_cache_fresh(store.get('path'), self._dir_mtime(store.get('path'))):
+                return True
+        return False
+        
+    def _scan_store(self, store: Dict[str, Any]) -> Iterator[FileRecord]:
+        """Yield file info for every file in a store using a single scandir pass"""
+        store_path = store.get('path')
+        store_name = store.get('name')
+        
+        try:
+            # DirEntry caches the type and stat info from the directory read
+            with os.scandir(store_path) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except (PermissionError, OSError) as e:
+                        logger.warning(f"Error accessing file {entry.name}: {e}")
+                        continue
+                    yield FileRecord(entry.name, entry.path, stat.st_size, stat.st_mtime, store_name)
+        except FileNotFoundError:
+            # Missing stores are reported when the config is processed
+            return
+        except (PermissionError, OSError) as e:
+            logger.warning(f"Error accessing store directory {store_path}: {e}")
+
+    def _refresh_files_cache(self) -> Dict[str, FileRecord]:
+        """Refresh the files cache, rescanning only stores whose directory changed"""
         stores = self.get_enabled_stores()
-        all_files = []
+        mtimes = [self._dir_mtime(store.get('path')) for store in stores]
+        # Keep the listings that are still valid so they can't vanish mid-refresh
+        reused = {}
+        stale = []
+        for store, mtime in zip(stores, mtimes):
+            if self._dir_cache_fresh(store.get('path'), mtime):
+                reused[store.get('path')] = self._dir_cache[store.get('path')][1]
+            else:
+                stale.append(store)
         
-        for store in stores:
+        # Scan changed stores concurrently, they often live on different disks
+        if len(stale) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(stale)), thread_name_prefix='store-scan') as executor:
+                scanned = dict(zip((store.get('path') for store in stale),
+                                   executor.map(lambda store: list(self._scan_store(store)), stale)))
+        else:
+            scanned = {store.get('path'): list(self._scan_store(store)) for store in stale}
+        
+        all_files = []
+        for store, mtime in zip(stores, mtimes):
             store_path = store.get('path')
-            store_name = store.get('name')
-            
-            if os.path.exists(store_path):
-                try:
-                    # Use os.scandir for better performance
-                    with os.scandir(store_path) as entries:
-                        for entry in entries:
-                            if entry.is_file():
-                                try:
-                                    stat = entry.stat()
-                                    all_files.append({
-                                        'name': entry.name,
-                                        'path': os.path.join(store_path, entry.name),
-                                        'size': stat.st_size,
-                                        'modified': stat.st_mtime,
-                                        'store_name': store_name
-                                    })
-                                except (PermissionError, OSError) as e:
-                                    logger.warning(f"Error accessing file {entry.name}: {e}")
-                except (PermissionError, OSError) as e:
-                    logger.warning(f"Error accessing store directory {store_path}: {e}")
+            entries = scanned.get(store_path)
+            if entries is None:
+                entries = reused[store_path]
+            else:
+                self._set_dir_cache(store_path, mtime, entries)
+                # The scan already has every size, reseed the byte counter
+                self._store_bytes[store_path] = sum(f.size for f in entries)
+            all_files.extend(entries)
         
-        # Sort files by name for consistency
-        all_files.sort(key=lambda f: f['name'])
-        self._all_files_cache = all_files
-        # Update cache timestamp
-        self._cache_timestamp = time.time() if 'time' in globals() else os.path.getmtime(self.config_file)
-
-    def get_file_by_name(self, filename: str) -> Optional[Dict[str, Any]]:
-        """Find a file by its name across all stores"""
-        all_files = self.get_all_files()
+        # Index files by name for O(1) lookups, first store wins on duplicates
+        files_by_name = {}
         for file in all_files:
-            if file['name'] == filename:
-                return file
-        return None
+            files_by_name.setdefault(file.name, file)
+        
+        self._files_by_name = files_by_name
+        # Sorted list is rebuilt lazily from the index
+        self._all_files_cache = None
+        return files_by_name
+
+    def get_file_by_name(self, filename: str) -> Optional[FileRecord]:
+        """Find a file by its name across all stores using the name index"""
+        # Make sure the name index is populated and fresh
+        return self._ensure_files_index().get(filename)
+
+    def _dir_cache_fresh(self, store_path: str, mtime: Optional[int]) -> bool:
+        """Check if the cached listing of a store matches its directory mtime"""
+        cached = self._dir_cache.get(store_path)
+        if cached is None or cached[0] != mtime:
+            return False
+        # A listing taken while the mtime was too recent to trust is used
+        # until the window has passed, then confirmed by one rescan
+        return cached[2] is None or time.time_ns() < cached[2]
+
+    def _set_dir_cache(self, store_path: str, mtime: Optional[int], entries: List[FileRecord]) -> None:
+        """Cache a store listing, scheduling one rescan if the directory mtime is too recent to trust"""
+        recheck_at = None
+        if mtime is not None and time.time_ns() - mtime < self._DIR_MTIME_SLACK_NS:
+            recheck_at = mtime + self._DIR_MTIME_SLACK_NS
+        self._dir_cache[store_path] = (mtime, entries, recheck_at)
+
+    def _update_dir_cache(self, store_name: str, filename: str, file_info: Optional[FileRecord] = None) -> None:
+        """Replace or remove one file in a cached store listing without rescanning it"""
+        store = self.get_store_by_name(store_name)
+        if store is None:
+            return
+        store_path = store.get('path')
+        cached = self._dir_cache.get(store_path)
+        if cached is None:
+            return
+        entries = [f for f in cached[1] if f.name != filename]
+        if file_info is not None:
+            entries.append(file_info)
+        self._set_dir_cache(store_path, self._dir_mtime(store_path), entries)
+
+    def _store_rank(self, store_name: str) -> int:
+        """Get the position of a store in config order, stores no longer enabled sort last"""
+        for rank, store in enumerate(self.get_enabled_stores()):
+            if store.get('name') == store_name:
+                return rank
+        return len(self.get_enabled_stores())
+
+    def add_file(self, file_info: FileRecord) -> None:
+        """Add or replace a file in the files index after an upload"""
+        with self._refresh_lock:
+            if self._files_by_name is None:
+                # Index not built yet, the next lookup will scan the stores
+                self._store_bytes.clear()
+                return
+            previous = self._files_by_name.get(file_info.name)
+            delta = file_info.size
+            if previous is not None and previous.store_name == file_info.store_name:
+                # The upload overwrote the existing file
+                delta -= previous.size
+            self._adjust_store_bytes(file_info.store_name, delta)
+            # Match the rescan, where the first store in config order wins on duplicates
+            if previous is None or self._store_rank(file_info.store_name) <= self._store_rank(previous.store_name):
+                self._files_by_name[file_info.name] = file_info
+                self._all_files_cache = None
+            self._update_dir_cache(file_info.store_name, file_info.name, file_info)
+
+    def remove_file(self, filename: str) -> None:
+        """Remove a file from the files index after a delete"""
+        with self._refresh_lock:
+            if self._files_by_name is None:
+                self._store_bytes.clear()
+                return
+            file_info = self._files_by_name.pop(filename, None)
+            self._all_files_cache = None
+            if file_info is not None:
+                self._adjust_store_bytes(file_info.store_name, -file_info.size)
+                self._update_dir_cache(file_info.store_name, filename)
 
     def refresh_caches(self) -> None:
         """Refresh all caches manually"""
@@ -389,9 +765,6 @@ class Configuration:
         self.get_enabled_stores()
         self.get_all_files(force_refresh=True)
 
-# Ensure we import time module for cache timestamp
-import time
-
 # Create a global instance of the Configuration class for backward compatibility
 # This allows existing code to use config.X functions
 config_instance = Configuration.get_instance()
@@ -409,7 +782,7 @@ def load_config() -> Dict[str, Any]:
 def save_config(config: Optional[Dict[str, Any]] = None) -> bool:
     return config_instance.save_config(config)
 
-def get_enabled_stores() -> List[Dict[str, Any]]:
+def get_enabled_stores() -> Tuple[Dict[str, Any], ...]:
     return config_instance.get_enabled_stores()
 
 def get_store_by_name(name: str) -> Optional[Dict[str, Any]]:
@@ -418,19 +791,25 @@ def get_store_by_name(name: str) -> Optional[Dict[str, Any]]:
 def get_max_file_size() -> int:
     return config_instance.get_max_file_size()
 
-def get_allowed_extensions() -> Set[str]:
+def get_allowed_extensions() -> FrozenSet[str]:
     return config_instance.get_allowed_extensions()
 
+def is_allowed_filename(filename: str) -> bool:
+    return config_instance.is_allowed_filename(filename)
+
 def get_store_free_space(store_path: str) -> float:
     return config_instance.get_store_free_space(store_path)
 
-def get_store_for_upload(file_size: int) -> Optional[Dict[str, Any]]:
-    return config_instance.get_store_for_upload(file_size)
+def get_store_free_bytes(store_path: str) -> int:
+    return config_instance.get_store_free_bytes(store_path)
+
+def get_store_for_upload(file_size: int, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    return config_instance.get_store_for_upload(file_size, filename)
 
-def get_all_files(force_refresh: bool = False) -> List[Dict[str, Any]]:
-    return config_instance.get_all_files(force_refresh)
+def get_all_files(force_refresh: bool = False, limit: Optional[int] = None) -> List[FileRecord]:
+    return config_instance.get_all_files(force_refresh, limit)
 
-def get_file_by_name(filename: str) -> Optional[Dict[str, Any]]:
+def get_file_by_name(filename: str) -> Optional[FileRecord]:
     return config_instance.get_file_by_name(filename)
 
 def refresh_caches() -> None:
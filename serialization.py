@@ -0,0 +1,37 @@
+"""
+JSON serialization helpers for the WiFi File Transfer application.
+Uses orjson when it is installed and falls back to the standard library otherwise.
+"""
+
+from typing import Any, Union
+
+try:
+    import orjson
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Parse JSON from bytes or a string"""
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to compact JSON bytes"""
+        return orjson.dumps(obj)
+
+    def dumps_pretty(obj: Any) -> bytes:
+        """Serialize an object to indented JSON bytes for files meant to be edited"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    import json
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Parse JSON from bytes or a string"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to compact JSON bytes"""
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps_pretty(obj: Any) -> bytes:
+        """Serialize an object to indented JSON bytes for files meant to be edited"""
+        return json.dumps(obj, indent=2).encode('utf-8')